@@ -1,57 +1,54 @@
 from fastapi import APIRouter
 
-from typing import Dict, Optional
-import warnings
-import numpy as np
+from typing import Any, Dict, Optional
+import threading
+import time
 import pandas as pd  # type: ignore[import]
 from fastapi import HTTPException
 from mysql.connector import Error  # type: ignore[import-untyped]
 
-from app.db.db import pool  # type: ignore[import-untyped]
-
-# Suppress pandas warning about mysql-connector compatibility
-warnings.filterwarnings(
-    "ignore",
-    message=".*SQLAlchemy connectable.*",
-    category=UserWarning,
-    module="pandas",
-)
+from app.db.db import get_pool  # type: ignore[import-untyped]
 
 traffic_router = APIRouter(prefix="/api/v1", tags=["Traffic Commute API"])
 
-
-def parse_duration_minutes(val) -> float:
-    """Convert "3720s" → 62.0"""
-    if isinstance(val, str) and val.endswith("s"):
-        try:
-            return int(val[:-1]) / 60.0
-        except Exception:
-            return np.nan
-    return np.nan
+# Commute data only changes when the weekly data gathering job runs, which
+# refreshes the cache when it finishes. The TTL is a backstop for writes made
+# outside this process and for results loaded before any data existed.
+_CACHE_TTL_SECONDS = 3600
+_cache: Dict[str, Any] = {"result": None, "ts": 0.0}
+_cache_lock = threading.Lock()
 
 
 def get_commute_data_from_db() -> pd.DataFrame:
     """Fetch commute data from MySQL database and return as DataFrame."""
-    connection = pool.get_connection()
+    connection = get_pool().get_connection()
     try:
+        # Weekday and time-of-day are derived from the local date and the
+        # local part of the RFC 3339 timestamp, so only the columns the
+        # heatmap needs leave the database. The median stays in pandas since
+        # MySQL has no MEDIAN aggregate.
         query = """
         SELECT
-            date_local,
-            local_departure_time,
-            departure_time_rfc3339,
             direction,
-            distance_meters,
-            duration,
-            `condition`,
-            status_code,
-            status_message
+            DATE(date_local) AS date_local,
+            WEEKDAY(date_local) AS weekday_num,
+            SUBSTRING(departure_time_rfc3339, 12, 5) AS time_hm,
+            duration
         FROM commute_slots
         WHERE duration IS NOT NULL
           AND duration != ''
-        ORDER BY departure_time_rfc3339
+          AND WEEKDAY(date_local) < 5
         """
-        df = pd.read_sql(query, connection)  # type: ignore[attr-defined]
-        return df
+        # Build the frame straight from the cursor rather than pd.read_sql,
+        # which expects an SQLAlchemy connectable and warns on mysql-connector.
+        cursor = connection.cursor()
+        try:
+            cursor.execute(query)
+            rows = cursor.fetchall()
+            columns = cursor.column_names
+        finally:
+            cursor.close()
+        return pd.DataFrame.from_records(rows, columns=columns)
     except Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     finally:
@@ -64,27 +61,23 @@ def process_commute_data(df: pd.DataFrame) -> Dict[str, Dict]:
     if df.empty:
         return {}
 
-    # Parse duration to minutes
-    df["minutes"] = df["duration"].apply(parse_duration_minutes)
-    df = df[df["minutes"].notna()]  # type: ignore[assignment]
-
-    # Parse timestamps
-    df["ts"] = pd.to_datetime(df["departure_time_rfc3339"], errors="coerce")
-    df = df[df["ts"].notna()]  # type: ignore[assignment]
+    # Parse duration to integer seconds ("3720s" → 3720), vectorized. Minutes
+    # are derived after the median so the compact dtype costs no precision.
+    df["seconds"] = pd.to_numeric(
+        df["duration"].astype(str).str.removesuffix("s"), errors="coerce"
+    )
+    df = df[df["seconds"].notna()].astype({"seconds": "int32", "direction": "category"})
 
     # Display-friendly direction labels
-    df["direction"] = df["direction"].replace(  # type: ignore[assignment]
-        {"H2W": "Home → Work", "W2H": "Work → Home"}
+    direction_labels = {"H2W": "Home → Work", "W2H": "Work → Home"}
+    df["direction"] = df["direction"].cat.rename_categories(
+        lambda d: direction_labels.get(d, d)
     )
 
     # Weekday mapping
-    weekday_map = {0: "Mon", 1: "Tue", 2: "Wed", 3: "Thu", 4: "Fri", 5: "Sat", 6: "Sun"}
-    df["weekday_num"] = df["ts"].dt.weekday
+    weekday_map = {0: "Mon", 1: "Tue", 2: "Wed", 3: "Thu", 4: "Fri"}
     df["weekday"] = df["weekday_num"].map(weekday_map)  # type: ignore[arg-type]
 
-    # Time-of-day label as HH:MM
-    df["time_hm"] = df["ts"].dt.strftime("%H:%M")
-
     weekday_order = ["Mon", "Tue", "Wed", "Thu", "Fri"]
 
     result = {}
@@ -96,33 +89,29 @@ def process_commute_data(df: pd.DataFrame) -> Dict[str, Dict]:
             continue
 
         # Get date range
-        monday = ddir["ts"].dt.date.min()  # type: ignore[attr-defined]
-        friday = ddir["ts"].dt.date.max()  # type: ignore[attr-defined]
+        monday = ddir["date_local"].min()
+        friday = ddir["date_local"].max()
         date_range = f"{monday:%b. %d} – {friday:%b. %d}"
 
         # Determine period (Morning or Evening)
-        hours = ddir["ts"].dt.hour  # type: ignore[attr-defined]
-        period_label = "Morning" if hours.max() <= 14 else "Evening"
+        last_hour = int(ddir["time_hm"].max()[:2])
+        period_label = "Morning" if last_hour <= 14 else "Evening"
 
-        # Create pivot table (median minutes by weekday and time)
+        # Median minutes by weekday and time (groupby is much lighter than pivot_table)
         times_sorted = sorted(ddir["time_hm"].unique())  # type: ignore[attr-defined]
-        pivot = ddir.pivot_table(
-            index="weekday", columns="time_hm", values="minutes", aggfunc="median"
+        pivot = (
+            ddir.groupby(["weekday", "time_hm"], observed=True, sort=False)["seconds"]
+            .median()
+            .div(60.0)
+            .unstack("time_hm")
+            .reindex(index=weekday_order, columns=times_sorted)
+        )
+
+        # Convert to nested dict format ({weekday: {time_hm: minutes}}),
+        # with NaN → None for JSON serialization
+        heatmap_data: Dict[str, Dict[str, Optional[float]]] = (
+            pivot.astype(object).where(pivot.notna(), None).to_dict(orient="index")  # type: ignore[assignment]
         )
-        pivot = pivot.reindex(index=weekday_order, columns=times_sorted)
-
-        # Convert pivot table to nested dict format
-        heatmap_data: Dict[str, Dict[str, Optional[float]]] = {}
-        for weekday in weekday_order:
-            if weekday in pivot.index:
-                heatmap_data[weekday] = {}
-                for time_hm in times_sorted:
-                    if time_hm in pivot.columns:
-                        value = pivot.loc[weekday, time_hm]
-                        # Convert NaN to None for JSON serialization
-                        heatmap_data[weekday][time_hm] = (
-                            float(value) if not pd.isna(value) else None
-                        )
 
         result[direction_label] = {
             "period": period_label,
@@ -135,6 +124,38 @@ def process_commute_data(df: pd.DataFrame) -> Dict[str, Dict]:
     return result
 
 
+def _load_result() -> Dict[str, Dict]:
+    df = get_commute_data_from_db()
+    return process_commute_data(df)
+
+
+def _get_cached_result() -> Dict[str, Dict]:
+    """Return processed commute data, reloading it once the TTL has expired."""
+    with _cache_lock:
+        # Endpoints run in the threadpool, so hold the lock while loading to
+        # keep concurrent requests from all hitting the database at once.
+        now = time.monotonic()
+        if _cache["result"] is None or now - _cache["ts"] >= _CACHE_TTL_SECONDS:
+            _cache["result"] = _load_result()
+            _cache["ts"] = now
+        return _cache["result"]
+
+
+def refresh_cache():
+    """Recompute commute data after new data was gathered, off the request path."""
+    try:
+        result = _load_result()
+    except Exception:
+        # Don't keep serving data that is known to be stale
+        with _cache_lock:
+            _cache["result"] = None
+            _cache["ts"] = 0.0
+        raise
+    with _cache_lock:
+        _cache["result"] = result
+        _cache["ts"] = time.monotonic()
+
+
 @traffic_router.get("/")
 async def root():
     """Root endpoint."""
@@ -142,7 +163,7 @@ async def root():
 
 
 @traffic_router.get("/commute/heatmap")
-async def get_commute_heatmap_data(
+def get_commute_heatmap_data(
     direction: Optional[str] = None,
 ):
     """
@@ -155,8 +176,7 @@ async def get_commute_heatmap_data(
         Dictionary with heatmap data organized by direction
     """
     try:
-        df = get_commute_data_from_db()
-        result = process_commute_data(df)
+        result = _get_cached_result()
 
         # Filter by direction if specified
         if direction:
@@ -174,11 +194,10 @@ async def get_commute_heatmap_data(
 
 
 @traffic_router.get("/commute/directions")
-async def get_directions():
+def get_directions():
     """Get list of available directions."""
     try:
-        df = get_commute_data_from_db()
-        result = process_commute_data(df)
+        result = _get_cached_result()
         return {"directions": list(result.keys())}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
@@ -1,3 +1,4 @@
+import functools
 import json
 
 import boto3  # type: ignore[import-untyped]
@@ -18,4 +19,7 @@ def _get_secrets_from_aws():
         raise e
 
 
-SECRETS = _get_secrets_from_aws()
+@functools.lru_cache(maxsize=1)
+def get_secrets():
+    """Fetch secrets from AWS on first use only, so importing this module is free."""
+    return _get_secrets_from_aws()
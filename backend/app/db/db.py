@@ -1,9 +1,12 @@
 import os
+import threading
+import time
 from typing import Any, cast
 
 from mysql.connector import pooling
+from mysql.connector.errors import PoolError
 
-from app.constants.secrets import SECRETS
+from app.constants.secrets import get_secrets
 
 
 def get_dev_secret():
@@ -14,23 +17,51 @@ def get_prod_secret():
     return {
         "host": "mysql",
         "port": "3306",
-        "user": SECRETS["mysql_user"],
-        "password": SECRETS["mysql_password"],
+        "user": get_secrets()["mysql_user"],
+        "password": get_secrets()["mysql_password"],
     }
 
 
-dbconfig = {"database": "traffic_larsjohansen_com", "autocommit": True}
+# Endpoints run in FastAPI's threadpool, so size the pool for concurrent
+# requests (mysql-connector caps it at 32).
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "25"))
+POOL_RETRY_DELAY_SECONDS = 0.1
 
-if os.getenv("DEVELOPMENT_MODE") == "prod":
-    dbconfig = dbconfig | get_prod_secret()
-else:
-    dbconfig = dbconfig | get_dev_secret()
+_pool = None
+_pool_lock = threading.Lock()
 
-pool = pooling.MySQLConnectionPool(
-    pool_name="traffic-bay-area",
-    pool_size=5,
-    **cast(dict[str, Any], dbconfig),
-)
+
+def get_dbconfig():
+    # time_zone is applied once per physical connection when it is opened; since
+    # the pool does not reset sessions it stays in effect for every borrow.
+    dbconfig = {
+        "database": "traffic_larsjohansen_com",
+        "autocommit": True,
+        "time_zone": "+00:00",
+    }
+    if os.getenv("DEVELOPMENT_MODE") == "prod":
+        return dbconfig | get_prod_secret()
+    return dbconfig | get_dev_secret()
+
+
+def get_pool():
+    """Return the shared connection pool, creating it on first use.
+
+    Created lazily so importing this module never reaches AWS Secrets Manager
+    or MySQL; the lock keeps concurrent first requests from opening two pools.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = pooling.MySQLConnectionPool(
+                pool_name="traffic-bay-area",
+                pool_size=POOL_SIZE,
+                # Skip the reset round-trip on every release; connections are
+                # autocommit and Database commits/rolls back explicitly.
+                pool_reset_session=False,
+                **cast(dict[str, Any], get_dbconfig()),
+            )
+        return _pool
 
 
 class Database:
@@ -39,9 +70,14 @@ class Database:
         self.cursor = None
 
     def __enter__(self):
-        self.conn = pool.get_connection()
+        pool = get_pool()
+        try:
+            self.conn = pool.get_connection()
+        except PoolError:
+            # Pool momentarily exhausted; retry once after in-flight work returns
+            time.sleep(POOL_RETRY_DELAY_SECONDS)
+            self.conn = pool.get_connection()
         self.cursor = self.conn.cursor()
-        self.cursor.execute("SET time_zone = '+00:00'")
         return self.cursor
 
     def __exit__(self, exc_type, exc_val, exc_tb):
@@ -11,14 +11,18 @@ Database:
 """
 
 import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, time as dtime
 from zoneinfo import ZoneInfo
 from mysql.connector import Error  # type: ignore[import-untyped]
 import requests  # type: ignore[import-untyped]
+from requests.adapters import HTTPAdapter  # type: ignore[import-untyped]
+from urllib3.util.retry import Retry
 
-from app.constants.secrets import SECRETS
-from app.db.db import Database, pool  # type: ignore[import-untyped]
+from app.constants.secrets import get_secrets
+from app.db.db import Database, get_pool  # type: ignore[import-untyped]
 
 TZ = ZoneInfo("America/Los_Angeles")
 ROUTES_MATRIX_URL = "https://routes.googleapis.com/distanceMatrix/v2:computeRouteMatrix"
@@ -28,6 +32,38 @@ WORK = "650 California St, San Francisco, CA 94108"
 
 INTERVAL_MINUTES = 15
 
+# Departure window sampled each weekday, per direction: (direction, start, end)
+SCHEDULE_WINDOWS = (
+    ("H2W", dtime(5, 0), dtime(13, 0)),  # Home → Work
+    ("W2H", dtime(12, 0), dtime(20, 0)),  # Work → Home
+)
+
+# Routes Matrix calls are network-bound, so they are fanned out over a small
+# thread pool while the rate limiter keeps us under Google's QPS quota.
+MATRIX_MAX_WORKERS = 8
+MATRIX_MAX_QPS = 10
+UPDATE_BATCH_SIZE = 100
+
+# Shared session so keep-alive connections to the Routes API are reused
+# across calls instead of paying a TCP + TLS handshake per slot. Throttling
+# and transient server errors are retried with exponential backoff; the
+# matrix request is a read, so retrying the POST is safe.
+_SESSION = requests.Session()
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=MATRIX_MAX_WORKERS,
+        max_retries=Retry(
+            total=5,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset({"POST"}),
+            raise_on_status=False,
+        ),
+    ),
+)
+
 
 # -------------------------------------------------------
 # Database connection and setup
@@ -35,7 +71,7 @@ INTERVAL_MINUTES = 15
 def get_db_connection():
     """Create and return a MySQL database connection from the pool."""
     try:
-        connection = pool.get_connection()
+        connection = get_pool().get_connection()
         return connection
     except Error as e:
         raise SystemExit(f"❌ Database connection failed: {e}")
@@ -68,10 +104,6 @@ def generate_times(day_dt, start: dtime, end: dtime, interval_minutes=INTERVAL_M
 
 def generate_schedule_db():
     """Generate schedule and insert into database."""
-    weekdays = get_next_week_weekdays()
-    morning_start, morning_end = dtime(5, 0), dtime(13, 0)
-    evening_start, evening_end = dtime(12, 0), dtime(20, 0)
-
     insert_query = """
     INSERT INTO commute_slots
         (date_local, local_departure_time, departure_time_rfc3339, direction,
@@ -81,54 +113,38 @@ def generate_schedule_db():
         updated_at = CURRENT_TIMESTAMP
     """
 
-    inserted_count = 0
-    updated_count = 0
-
+    # One row per (weekday, direction, departure time), built in a single pass
+    # and shaped exactly as executemany() wants its parameters.
+    rows = [
+        (
+            ts.date().isoformat(),
+            ts.strftime("%Y-%m-%d %H:%M:%S %Z"),
+            ts.isoformat(),
+            direction,
+            None,
+            None,
+            None,
+            None,
+            None,
+        )
+        for day in get_next_week_weekdays()
+        for direction, start, end in SCHEDULE_WINDOWS
+        for ts in generate_times(day, start, end, INTERVAL_MINUTES)
+    ]
+
+    # executemany() rewrites this into a single multi-row INSERT, so the whole
+    # week is written in one round-trip instead of one per slot.
     with Database() as cursor:
-        for day in weekdays:
-            # Home → Work
-            for ts in generate_times(day, morning_start, morning_end, INTERVAL_MINUTES):
-                values = (
-                    ts.date().isoformat(),
-                    ts.strftime("%Y-%m-%d %H:%M:%S %Z"),
-                    ts.isoformat(),
-                    "H2W",
-                    None,
-                    None,
-                    None,
-                    None,
-                    None,
-                )
-                try:
-                    cursor.execute(insert_query, values)
-                    if cursor.rowcount == 1:
-                        inserted_count += 1
-                    else:
-                        updated_count += 1
-                except Error as e:
-                    print(f"⚠️  Error inserting slot {ts.isoformat()}: {e}")
-
-            # Work → Home
-            for ts in generate_times(day, evening_start, evening_end, INTERVAL_MINUTES):
-                values = (
-                    ts.date().isoformat(),
-                    ts.strftime("%Y-%m-%d %H:%M:%S %Z"),
-                    ts.isoformat(),
-                    "W2H",
-                    None,
-                    None,
-                    None,
-                    None,
-                    None,
-                )
-                try:
-                    cursor.execute(insert_query, values)
-                    if cursor.rowcount == 1:
-                        inserted_count += 1
-                    else:
-                        updated_count += 1
-                except Error as e:
-                    print(f"⚠️  Error inserting slot {ts.isoformat()}: {e}")
+        try:
+            cursor.executemany(insert_query, rows)
+        except Error as e:
+            print(f"⚠️  Error inserting schedule ({len(rows)} slots): {e}")
+            return
+
+        # ON DUPLICATE KEY UPDATE reports 1 affected row per insert and 2 per
+        # update, so the split can be recovered from the total.
+        updated_count = max(cursor.rowcount - len(rows), 0)
+        inserted_count = len(rows) - updated_count
 
     print(
         f"✅ Schedule generated: {inserted_count} new slots, {updated_count} existing slots updated"
@@ -142,6 +158,23 @@ def waypoint(address: str):
     return {"waypoint": {"address": address}}
 
 
+class RateLimiter:
+    """Spaces out calls so that at most `rate` of them start per second, across threads."""
+
+    def __init__(self, rate: float):
+        self._interval = 1.0 / rate
+        self._lock = threading.Lock()
+        self._next_slot = time.monotonic()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next_slot, now)
+            self._next_slot = slot + self._interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
 def call_matrix(api_key, origin, dest, departure_rfc3339):
     headers = {
         "Content-Type": "application/json",
@@ -156,7 +189,10 @@ def call_matrix(api_key, origin, dest, departure_rfc3339):
         "departureTime": departure_rfc3339,
     }
 
-    r = requests.post(ROUTES_MATRIX_URL, headers=headers, json=payload, timeout=30)
+    try:
+        r = _SESSION.post(ROUTES_MATRIX_URL, headers=headers, json=payload, timeout=30)
+    except requests.RequestException as e:
+        return {"error": f"Request failed: {e}"}
     if r.status_code != 200:
         return {"error": f"HTTP {r.status_code}: {r.text}"}
 
@@ -167,19 +203,80 @@ def call_matrix(api_key, origin, dest, departure_rfc3339):
     return data[0]
 
 
-def update_db_with_results():
-    """Fetch slots from database, call API, and update results."""
+def result_to_update_values(row, result):
+    """Map a Routes Matrix result onto the UPDATE parameters for its slot."""
+    if "error" in result:
+        return (None, None, None, "ERROR", result["error"], row["id"])
+
+    distance_meters = result.get("distanceMeters")
+    duration = result.get("duration", "")
+    condition = result.get("condition", "")
+    status = result.get("status", {})
+    if isinstance(status, dict):
+        status_code = str(status.get("code", ""))
+        status_message = status.get("message", "")
+    else:
+        status_code = str(status)
+        status_message = ""
+
+    return (
+        distance_meters,
+        duration if duration else None,
+        condition if condition else None,
+        status_code if status_code else None,
+        status_message if status_message else None,
+        row["id"],
+    )
+
+
+def batch_update_query(row_count):
+    """UPDATE statement applying `row_count` result rows in one round-trip.
+
+    executemany() only folds INSERTs into a multi-row statement and would send
+    an UPDATE once per row, so the rows are joined in as a VALUES table
+    (MySQL 8.0.19+). Parameters per row follow result_to_update_values().
+    """
+    rows = ",\n        ".join(["ROW(%s, %s, %s, %s, %s, %s)"] * row_count)
+    return f"""
+    UPDATE commute_slots AS c
+    JOIN (
+        VALUES
+        {rows}
+    ) AS v (distance_meters, duration, `condition`, status_code, status_message, id)
+        ON c.id = v.id
+    SET c.distance_meters = v.distance_meters,
+        c.duration = v.duration,
+        c.`condition` = v.`condition`,
+        c.status_code = v.status_code,
+        c.status_message = v.status_message,
+        c.updated_at = CURRENT_TIMESTAMP
+    """
+
+
+def flatten(rows):
+    return [value for row in rows for value in row]
+
+
+def update_db_with_results(stop_event=None):
+    """Fetch slots from database, call API, and update results.
+
+    If `stop_event` is set (server shutdown), no further API calls are started;
+    results already fetched are still written.
+    """
     api_key = os.getenv("GOOGLE_MAPS_API_KEY")
     if os.getenv("DEVELOPMENT_MODE") == "prod":
-        api_key = SECRETS["google_maps_api_key"]
+        api_key = get_secrets()["google_maps_api_key"]
     if not api_key:
         raise SystemExit("❌ Please set GOOGLE_MAPS_API_KEY environment variable")
 
-    # Fetch slots that need updating (empty status_code or NULL)
+    # Fetch slots that need updating (empty status_code or NULL), plus
+    # upcoming slots whose previous attempt failed
     select_query = """
     SELECT id, departure_time_rfc3339, direction
     FROM commute_slots
-    WHERE status_code IS NULL OR status_code = ''
+    WHERE status_code IS NULL
+       OR status_code = ''
+       OR (status_code = 'ERROR' AND date_local >= CURDATE())
     ORDER BY departure_time_rfc3339
     """
 
@@ -197,76 +294,65 @@ def update_db_with_results():
         print("✅ No slots need updating")
         return
 
-    update_query = """
-    UPDATE commute_slots
-    SET distance_meters = %s,
-        duration = %s,
-        `condition` = %s,
-        status_code = %s,
-        status_message = %s,
-        updated_at = CURRENT_TIMESTAMP
-    WHERE id = %s
-    """
+    limiter = RateLimiter(MATRIX_MAX_QPS)
+
+    def stopping():
+        return stop_event is not None and stop_event.is_set()
+
+    def fetch(row):
+        direction = row["direction"]
+        origin = HOME if direction == "H2W" else WORK
+        dest = WORK if direction == "H2W" else HOME
+        if stopping():
+            return row, None
+        limiter.wait()
+        if stopping():
+            return row, None
+        return row, call_matrix(api_key, origin, dest, row["departure_time_rfc3339"])
 
     updated_count = 0
     error_count = 0
-
-    # Use Database context manager for updates
+    pending = []
+
+    def flush(cursor):
+        nonlocal updated_count, error_count
+        try:
+            cursor.execute(batch_update_query(len(pending)), flatten(pending))
+            updated_count += len(pending)
+        except Error as e:
+            # A single statement, so a failed batch leaves none of its rows written
+            print(f"⚠️  Error updating {len(pending)} slots: {e}")
+            error_count += len(pending)
+        pending.clear()
+
+    # Results are written in batches as they come back, so slots that were
+    # already fetched are kept even if the run dies part-way through.
     with Database() as cursor:
-        for idx, row in enumerate(rows):
-            direction = row["direction"]
-            origin = HOME if direction == "H2W" else WORK
-            dest = WORK if direction == "H2W" else HOME
-
-            ts = row["departure_time_rfc3339"]
-            result = call_matrix(api_key, origin, dest, ts)
-
-            if "error" in result:
-                status_code = "ERROR"
-                status_message = result["error"]
-                distance_meters = None
-                duration = None
-                condition = None
-                error_count += 1
-            else:
-                distance_meters = result.get("distanceMeters")
-                duration = result.get("duration", "")
-                condition = result.get("condition", "")
-                status = result.get("status", {})
-                if isinstance(status, dict):
-                    status_code = str(status.get("code", ""))
-                    status_message = status.get("message", "")
-                else:
-                    status_code = str(status)
-                    status_message = ""
-
-            values = (
-                distance_meters,
-                duration if duration else None,
-                condition if condition else None,
-                status_code if status_code else None,
-                status_message if status_message else None,
-                row["id"],
-            )
-
-            try:
-                cursor.execute(update_query, values)
-                updated_count += 1
-            except Error as e:
-                print(f"⚠️  Error updating slot {row['id']}: {e}")
-                error_count += 1
-
-            if (idx + 1) % 50 == 0:
-                # Note: Database context manager will commit on exit
-                # Since pool has autocommit=True, changes are auto-committed
-                time.sleep(0.5)
-
+        with ThreadPoolExecutor(max_workers=MATRIX_MAX_WORKERS) as executor:
+            for row, result in executor.map(fetch, rows):
+                if result is None:
+                    # Skipped because of shutdown; the slot is retried next run
+                    continue
+                if "error" in result:
+                    error_count += 1
+                pending.append(result_to_update_values(row, result))
+                if len(pending) >= UPDATE_BATCH_SIZE:
+                    flush(cursor)
+        if pending:
+            flush(cursor)
+
+    if stopping():
+        print(
+            "⏹️  Stopped early on shutdown; remaining slots are left for the next run"
+        )
     print(f"✅ Database updated: {updated_count} slots updated, {error_count} errors")
 
 
-def main():
+def main(stop_event=None):
     generate_schedule_db()
-    update_db_with_results()
+    if stop_event is not None and stop_event.is_set():
+        return
+    update_db_with_results(stop_event)
     print("🎉 Commute sampling completed successfully.")
 
 
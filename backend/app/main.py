@@ -3,20 +3,21 @@ FastAPI application to expose commute data as an API.
 Returns data in the same format used for plotting heatmaps.
 """
 
+import asyncio
+import calendar
 import os
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
-from datetime import datetime
+from datetime import datetime, time as dtime, timedelta
 from zoneinfo import ZoneInfo
-import warnings
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from apscheduler.schedulers.asyncio import AsyncIOScheduler  # type: ignore[import-untyped,import]
-from apscheduler.triggers.cron import CronTrigger  # type: ignore[import-untyped,import]
 
 from app.api.healthcheck_api import healthcheck_router
-from app.api.traffic_api import traffic_router
-from app.job.data_gathering import main as data_gathering_main  # type: ignore[import-untyped]
+from app.api.traffic_api import refresh_cache, traffic_router
 
 # Configure logging
 logging.basicConfig(
@@ -25,56 +26,154 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Suppress pandas warning about mysql-connector compatibility
-warnings.filterwarnings(
-    "ignore",
-    message=".*SQLAlchemy connectable.*",
-    category=UserWarning,
-    module="pandas",
+# Data gathering runs weekly on Fridays at 11:00 PM Pacific Time
+# (handles PST/PDT automatically)
+pacific_tz = ZoneInfo("America/Los_Angeles")
+DATA_GATHERING_WEEKDAY = 4  # Friday
+DATA_GATHERING_TIME = dtime(23, 0)
+DATA_GATHERING_JOB_ID = "weekly_commute_data_gathering"
+DATA_GATHERING_TRIGGER = (
+    f"weekly ({calendar.day_abbr[DATA_GATHERING_WEEKDAY]} {DATA_GATHERING_TIME:%H:%M})"
 )
 
-# Configure scheduler with Pacific Time (handles PST/PDT automatically)
-pacific_tz = ZoneInfo("America/Los_Angeles")
-scheduler = AsyncIOScheduler(timezone=pacific_tz)
+# Upper bound on how long the lifespan waits for background tasks to unwind.
+# A job thread that is mid-run is not bounded by this: the process exits only
+# once it returns, so shutdown also signals it to stop starting API calls and
+# it finishes after its in-flight requests.
+SHUTDOWN_TIMEOUT_SECONDS = 5
+
 
+def gather_commute_data(stop_event: threading.Event):
+    """Run the (blocking) data gathering job and refresh the heatmap cache."""
+    # Imported here so the job's dependencies are only loaded once it first runs
+    from app.job.data_gathering import main as data_gathering_main  # type: ignore[import-untyped]
 
-def run_data_gathering():
-    """Wrapper function to run data gathering (synchronous function)."""
     logger.info("🔄 Starting data gathering job...")
-    start_time = datetime.utcnow()
+    start_time = time.perf_counter()
     try:
-        data_gathering_main()
-        duration = (datetime.utcnow() - start_time).total_seconds()
+        data_gathering_main(stop_event)
+        duration = time.perf_counter() - start_time
         logger.info(
-            f"✅ Data gathering job completed successfully in {duration:.2f} seconds"
+            "✅ Data gathering job completed successfully in %.2f seconds", duration
         )
-    except Exception as e:
-        duration = (datetime.utcnow() - start_time).total_seconds()
+    except (Exception, SystemExit) as e:
+        # data_gathering aborts with SystemExit (it doubles as a CLI script);
+        # in-process that must only fail this run, not stop the server
+        duration = time.perf_counter() - start_time
         logger.error(
-            f"❌ Error running data gathering job after {duration:.2f} seconds: {e}",
+            "❌ Error running data gathering job after %.2f seconds: %s",
+            duration,
+            e,
             exc_info=True,
         )
+    if stop_event.is_set():
+        return
+    # Precompute the heatmap so requests are served straight from the cache
+    # (even a partial run may have written new rows)
+    try:
+        refresh_cache()
+    except Exception as e:
+        logger.error("❌ Error refreshing commute data cache: %s", e, exc_info=True)
+
+
+def next_data_gathering_run(now: datetime) -> datetime:
+    """Return the first Friday 11:00 PM Pacific strictly after `now`."""
+    now = now.astimezone(pacific_tz)
+    days_ahead = (DATA_GATHERING_WEEKDAY - now.weekday()) % 7
+    next_run = datetime.combine(
+        now.date() + timedelta(days=days_ahead), DATA_GATHERING_TIME, tzinfo=pacific_tz
+    )
+    if next_run <= now:
+        next_run += timedelta(days=7)
+    return next_run
+
+
+async def run_data_gathering():
+    """Run data gathering in a worker thread so the event loop stays responsive."""
+    # Dedicated single-thread executor: the job never competes with request
+    # handlers for the loop's default pool, and only one pandas workset
+    # is in memory at a time
+    await asyncio.get_running_loop().run_in_executor(
+        app.state.data_job_executor, gather_commute_data, app.state.data_job_stop
+    )
+
+
+async def weekly_data_gathering(first_run: datetime):
+    """Sleep until each scheduled run and execute it, until cancelled."""
+    next_run = first_run
+    try:
+        while True:
+            app.state.next_data_gathering_run = next_run
+            # Compare absolute timestamps; subtracting two datetimes in the same
+            # zone would ignore a DST change in between
+            await asyncio.sleep(max(next_run.timestamp() - time.time(), 0))
+            # Publish the following run while this one executes, so the
+            # scheduler status never reports a time that has already passed
+            next_run += timedelta(days=7)
+            app.state.next_data_gathering_run = next_run
+            app.state.data_gathering_running = True
+            try:
+                await run_data_gathering()
+            except Exception:
+                # Keep the weekly schedule alive; the next run may well succeed
+                logger.exception("❌ Data gathering run failed")
+            finally:
+                app.state.data_gathering_running = False
+            # Weeks are stepped in wall-clock time (stays at 11:00 PM across
+            # DST); skip any further runs the job itself overran
+            now = datetime.now(pacific_tz)
+            while next_run <= now:
+                next_run += timedelta(days=7)
+    except asyncio.CancelledError:
+        logger.info("🛑 Weekly data gathering cancelled")
+        raise
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Manage scheduler lifecycle."""
-    # Startup: schedule the job
-    job = scheduler.add_job(
-        run_data_gathering,
-        trigger=CronTrigger(day_of_week="fri", hour=23, minute=0, timezone=pacific_tz),
-        id="weekly_commute_data_gathering",
-        replace_existing=True,
+    """Manage scheduler and background task lifecycle."""
+    app.state.bg_tasks = set()
+    app.state.data_job_executor = ThreadPoolExecutor(
+        max_workers=1, thread_name_prefix="data-gathering"
+    )
+    app.state.data_job_stop = threading.Event()
+    app.state.data_gathering_job_id = DATA_GATHERING_JOB_ID
+    app.state.data_gathering_trigger = DATA_GATHERING_TRIGGER
+    app.state.data_gathering_running = False
+
+    # Startup: a single background task sleeps until each weekly run; the first
+    # run is anchored once and later runs are a week apart
+    app.state.next_data_gathering_run = next_data_gathering_run(
+        datetime.now(pacific_tz)
+    )
+    task = asyncio.create_task(
+        weekly_data_gathering(app.state.next_data_gathering_run),
+        name="weekly_data_gathering",
     )
-    scheduler.start()
-    next_run = job.next_run_time
+    app.state.data_gathering_task = task
+    app.state.bg_tasks.add(task)
+    task.add_done_callback(app.state.bg_tasks.discard)
     logger.info(
-        f"✅ Scheduler started: Data gathering scheduled for Fridays at 11:00 PM Pacific Time"
-        f" (next run: {next_run.isoformat() if next_run else 'N/A'})"
+        "✅ Scheduler started: Data gathering scheduled %s Pacific Time (next run: %s)",
+        DATA_GATHERING_TRIGGER,
+        app.state.next_data_gathering_run,
     )
     yield
-    # Shutdown: stop the scheduler
-    scheduler.shutdown()
+    # Shutdown: tell a running job to stop starting API calls (its worker thread
+    # can't be cancelled and keeps the process alive until it returns), then
+    # cancel the background tasks awaiting it
+    app.state.data_job_stop.set()
+    tasks: list[asyncio.Task] = list(app.state.bg_tasks)
+    for task in tasks:
+        task.cancel()
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(*tasks, return_exceptions=True),
+            timeout=SHUTDOWN_TIMEOUT_SECONDS,
+        )
+    except asyncio.TimeoutError:
+        logger.warning("⚠️  Background tasks did not stop before shutdown timeout")
+    app.state.data_job_executor.shutdown(wait=False, cancel_futures=True)
     logger.info("✅ Scheduler stopped")
 
 
@@ -83,16 +182,19 @@ app = FastAPI(title="Traffic Commute API", version="1.0.0", lifespan=lifespan)
 app.include_router(healthcheck_router)
 app.include_router(traffic_router)
 
-if os.getenv("DEVELOPMENT_MODE") == "prod":
-    allowed_origins = "https://traffic.larsjohansen.com"
-else:
-    allowed_origins = "http://traffic.larsjohansen.com:5173"
+_ORIGINS_PROD = ("https://traffic.larsjohansen.com",)
+_ORIGINS_DEV = ("http://traffic.larsjohansen.com:5173",)
+allowed_origins = (
+    _ORIGINS_PROD if os.environ.get("DEVELOPMENT_MODE") == "prod" else _ORIGINS_DEV
+)
 
 # Enable CORS
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=[allowed_origins],  # Configure appropriately for production
+    allow_origins=allowed_origins,  # Configure appropriately for production
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    # The API is read-only; listing exactly what the frontend uses avoids the
+    # wildcard handling on every preflight
+    allow_methods=("GET", "OPTIONS"),
+    allow_headers=("content-type",),
 )
@@ -1,19 +1,62 @@
+import os
+import socket
 import sys
-from urllib import request, error
-
-URL = "http://127.0.0.1:8000/healthcheck"
-TIMEOUT = 2
-
-try:
-    with request.urlopen(URL, timeout=TIMEOUT) as r:
-        # 2xx is healthy
-        if 200 <= r.status < 500:
-            sys.exit(0)
-        sys.exit(1)
-except error.HTTPError as e:
-    if e.code >= 200 and e.code <= 500:
-        sys.exit(0)
-    sys.exit(1)
-except Exception:
-    # Connection errors / timeouts -> unhealthy
-    sys.exit(1)
+
+HOST = "127.0.0.1"
+PORT = 8000
+TIMEOUT = 1
+
+# "tcp" (default) only proves uvicorn is accepting connections; "http" also
+# exercises the app's dependency checks through the full ASGI stack.
+MODE = os.environ.get("HEALTHCHECK_MODE", "tcp")
+
+BASE_URL = f"http://{HOST}:{PORT}"
+# Each endpoint checks one dependency; all of them must answer for the
+# container to count as healthy.
+URLS = (
+    f"{BASE_URL}/healthcheck",  # API + MySQL
+    f"{BASE_URL}/healthcheck/scheduler",  # weekly data gathering scheduler
+)
+
+
+def tcp_probe() -> bool:
+    try:
+        socket.create_connection((HOST, PORT), timeout=TIMEOUT).close()
+    except OSError:
+        return False
+    return True
+
+
+def http_probe() -> bool:
+    import asyncio
+
+    import urllib3
+
+    # Bound connect and read separately so a wedged server can't hang the probe
+    http = urllib3.PoolManager(
+        num_pools=1,
+        maxsize=len(URLS),
+        timeout=urllib3.Timeout(connect=0.5, read=1.5),
+        retries=False,
+    )
+
+    def probe(url: str) -> bool:
+        try:
+            r = http.request("GET", url, preload_content=False)
+            r.release_conn()
+        except urllib3.exceptions.HTTPError:
+            # Connection errors / timeouts -> unhealthy
+            return False
+        # 2xx-4xx means the app is up and answering
+        return 200 <= r.status < 500
+
+    async def main() -> bool:
+        # Probes run concurrently, so total latency is the slowest check, not the sum
+        results = await asyncio.gather(*(asyncio.to_thread(probe, url) for url in URLS))
+        return all(results)
+
+    return asyncio.run(main())
+
+
+healthy = http_probe() if MODE == "http" else tcp_probe()
+sys.exit(0 if healthy else 1)